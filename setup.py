@@ -18,6 +18,7 @@ setup(
     install_requires=[
         # general
         'numpy==1.21.3',
+        'numba==0.55.1',
         'opencv-python-headless==4.5.3.56',
         'opencv-contrib-python-headless==4.5.4.60',
         'pylint==2.11.1',
@@ -8,7 +8,9 @@ class ForegroundMask:
     Class that gives the foreground mask.
     """
 
-    def __init__(self):
+    def __init__(self, mask_scale=0.5):
+        # Segmentation is run at reduced resolution and mask is scaled back to frame size
+        self.mask_scale = mask_scale
         self.selfie_segmentation = mp_selfie_segmentation.SelfieSegmentation(model_selection=1)
         self.bg_image = cv2.imread('smart_canvas/backgrounds/painterly_forest.jpg')
         dim = (1280,720)
@@ -42,23 +44,26 @@ class ForegroundMask:
         return mask
 
     def apply(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame.flags.writeable = False
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (int(width * self.mask_scale), int(height * self.mask_scale)),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        small.flags.writeable = False
 
-        results = self.selfie_segmentation.process(frame)
+        results = self.selfie_segmentation.process(small)
 
-        frame.flags.writeable = True
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        # Mask is soft so linear interpolation gives smoother edges than nearest
+        mask = cv2.resize(results.segmentation_mask, (width, height), interpolation=cv2.INTER_LINEAR)
+        self.mask = self.remove_isolated_pixels(mask)
 
-        self.mask = self.remove_isolated_pixels(results.segmentation_mask)
-
-        condition = np.stack((self.mask,) * 3, axis=-1) > 0.1
-        emptyBg = np.zeros(frame.shape, dtype=np.uint8)
-        self.output_image = np.where(condition, frame, emptyBg)
+        # Broadcast the mask over color channels to zero the background.
+        # Output is a new array so the camera frame is left untouched
+        condition = self.mask > 0.1
+        self.output_image = np.multiply(frame, condition[:, :, np.newaxis])
         return self.output_image
 
     def changeBackground(self, frame, current_filter):
-        condition = np.stack((self.mask,) * 3, axis=-1) > 0.1
+        condition = (self.mask > 0.1)[:, :, np.newaxis]
 
         self.bg_image = self.switchBackground(current_filter)
 
@@ -1,9 +1,21 @@
 from threading import Thread
+from queue import Queue
 import time
 
 import cv2
 
 
+class LatestFrameQueue(Queue):
+    """
+    Queue that holds only the latest frame. Putting a new frame replaces
+    the one that is not read yet, so put never blocks and consumer never lags.
+    """
+
+    def _put(self, item):
+        self.queue.clear()
+        self.queue.append(item)
+
+
 class VideoRead:
     """
     Class that continuously gets frames from a VideoCapture object
@@ -15,6 +27,8 @@ class VideoRead:
         self.stream = cv2.VideoCapture(src)
         self.stream.set(3, 1280)
         self.stream.set(4, 720)
+        # Keep only the newest frame in the driver buffer to avoid lag
+        self.stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         (self.status, self.frame) = self.stream.read()
         self.width = int(self.stream.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.height = int(self.stream.get(cv2.CAP_PROP_FRAME_HEIGHT))
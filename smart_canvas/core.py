@@ -4,7 +4,9 @@ from __future__ import annotations
 # Default packages
 
 # External packages
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
 import time
 from abc import ABC, abstractmethod
 
@@ -14,46 +16,126 @@ from smart_canvas.gesture_detection import HandDetect
 from smart_canvas.filters.carousel import FilterCarousel
 from smart_canvas.ui import UI
 
+# Countdown texts are formatted once instead of every frame
+COUNTDOWN_TEXTS = tuple(str(i) for i in range(5))
+
 class CanvasCore:
     """
     Class that processes the frame with a dedicated thread.
     """
     _state = None
+    _update_fn = None
     def __init__(self, q_consumer, screensize: tuple):
         self.q_consumer = q_consumer
         self.stopped = False
         self.tick = time.time()
-        self.out_frame = None
+        # Renderer reads out_frame from another thread. Id tells if frame has changed
+        self._frame_lock = Lock()
+        self._frame_id = 0
+        self._out_frame = None
         self.filters = FilterCarousel()
         self.fg_masker = ForegroundMask()
         self.hand_detector = HandDetect()
+        # Fingers are detected in own thread. Queue holds only the newest frame
+        self.finger_queue = Queue(maxsize=1)
+        # Frames are numbered so that every detection is used once and only by
+        # the state that published its frame
+        self._finger_seq = 0
+        self._consumed_seq = 0
+        self.finger_result = (0, 0)
         self.ui = UI()
+        # Direct reference to progress bar that is updated on every detection
+        self.bar = None
         self.win_size = screensize
+        # Heavy filtering is run here so that the state machine keeps updating frames
+        self.executor = ThreadPoolExecutor(max_workers=1)
 
         self.filtered_frame = None
         # This is initial state
         self.set_state(Startup())
 
+    @property
+    def out_frame(self):
+        return self._out_frame
+
+    @out_frame.setter
+    def out_frame(self, frame):
+        if frame is self._out_frame:
+            return
+        with self._frame_lock:
+            self._out_frame = frame
+            self._frame_id += 1
+
+    def get_display_frame(self):
+        """
+        Return id and the latest frame to display. Id changes when frame changes
+        so renderer can skip uploading the same frame again.
+        """
+        with self._frame_lock:
+            return self._frame_id, self._out_frame
+
     def set_state(self, state: State):
         self._state = state
         self._state.core = self
+        # Bound update is stored so process loop does not look it up on every frame
+        self._update_fn = state.update
+        # Detections of frames published before this are stale for new state
+        self._consumed_seq = self._finger_seq
         # FYI runs state "init"-function 
         self._state.enter(self.tick)
 
     def process(self):
         while not self.stopped:
             frame = self.q_consumer.get()
+            # Drop stale frames so that slow states always process the newest one
+            while True:
+                try:
+                    frame = self.q_consumer.get_nowait()
+                except Empty:
+                    break
             self.tick = time.time()
 
             # update state we are currently in
-            self._state.update(self.tick, frame)
+            self._update_fn(self.tick, frame)
+
+    def detect_fingers(self):
+        while not self.stopped:
+            try:
+                seq, frame = self.finger_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            try:
+                self.finger_result = (seq, self.hand_detector.count_fingers(frame))
+            except Exception as e:
+                # Keep thread alive. States get no new detection for this frame
+                print('[ERROR] Finger detection failed: {}'.format(e))
+
+    def request_finger_count(self, frame):
+        """
+        Publish frame to finger detection thread and return finger count of a new detection.
+        Older frame that is not yet processed is dropped. Returns None when no frame
+        published in current state has been detected since the previous call.
+        """
+        try:
+            self.finger_queue.get_nowait()
+        except Empty:
+            pass
+        self._finger_seq += 1
+        self.finger_queue.put_nowait((self._finger_seq, frame))
+        seq, count = self.finger_result
+        if seq <= self._consumed_seq:
+            return None
+        self._consumed_seq = seq
+        return count
 
     def start(self):
         Thread(target=self.process, args=()).start()
+        Thread(target=self.detect_fingers, args=()).start()
         return self
 
     def stop(self):
         self.stopped = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
 
     def get_ui_state(self):
         #return all things that should be visible on ui
@@ -62,7 +144,7 @@ class CanvasCore:
             eval = self.ui.elements[k]
             if eval.visible:
                 ui_state[k] = v
-        ui_state["hold_timer"] = self.ui.get_prog("bar")
+        ui_state["hold_timer"] = self.bar.scale
         return ui_state
         
 
@@ -91,6 +173,10 @@ class Startup(State):
         pass
 
     def enter(self, tick):
+        # Filters are compiled in worker thread so startup is not blocked
+        warmup = self.core.executor.submit(self.core.filters.warmup)
+        warmup.add_done_callback(self.report_warmup)
+
         self.ui = self.core.ui
         self.ui.create_text("help_1", (20,40), 40.0)
         self.ui.create_text("help_2", (20,80), 40.0)
@@ -111,14 +197,20 @@ class Startup(State):
         self.ui.set_text("idle_text_1", "SmartCanvas")
         self.ui.set_text("idle_text_2", "Wave your hand and start your artistic experience")
 
-        self.ui.set_text("filter_name", 'Current filter is {}'.format(self.core.filters.current_name))
+        self.ui.set_text("filter_name", self.core.filters.current_display_name)
         self.ui.create_progressbar("bar")
+        self.core.bar = self.ui.get("bar")
 
         self.ui.set_text("image_showing_promote", 'Wave hand to create another artwork')
 
     def update(self, tick, frame):
         self.core.set_state(Idle())
 
+    @staticmethod
+    def report_warmup(future):
+        if not future.cancelled() and future.exception() is not None:
+            print('[ERROR] Filter warmup failed: {}'.format(future.exception()))
+
 # This is one state of state machine. We move from state to state by setting different classes as core._state instance
 class Idle(State):
     """
@@ -157,11 +249,13 @@ class Idle(State):
         # Detect fingers 10 times in a second
         # Using timer here because frame rate can differ
         if self.finger_frame_interval - tick < 0:
-            finger_count = self.core.hand_detector.count_fingers(frame)
+            finger_count = self.core.request_finger_count(frame)
             self.finger_frame_interval = tick + 0.1
-            self.update_filter_trigger(finger_count)
+            # Triggers advance once per detection, not once per tick
+            if finger_count is not None:
+                self.update_filter_trigger(finger_count)
 
-            self.core.ui.set_prog("bar", self.take_pic_cnt)
+                self.core.bar.scale = self.take_pic_cnt
 
     def update_filter_trigger(self, finger_count):
         if finger_count == 5:
@@ -197,12 +291,14 @@ class Active(State):
         # Detect fingers 10 times in a second
         # Using timer here because frame rate can differ
         if self.finger_frame_interval - tick < 0:
-            finger_count = self.core.hand_detector.count_fingers(frame)
+            finger_count = self.core.request_finger_count(frame)
             self.finger_frame_interval = tick + 0.1
-            self.update_filter_trigger(finger_count)
-            self.update_filter_carousel(finger_count, tick)
+            # Triggers advance once per detection, not once per tick
+            if finger_count is not None:
+                self.update_filter_trigger(finger_count)
+                self.update_filter_carousel(finger_count, tick)
 
-            self.core.ui.set_prog("bar", self.take_pic_cnt)
+                self.core.bar.scale = self.take_pic_cnt
 
         if self.waiting_time - tick < 0:
             self.core.out_frame = self.core.filtered_frame
@@ -213,7 +309,7 @@ class Active(State):
             if self.change_filter_time - tick <= 0 and self.take_pic_cnt <= 0:
                 self.change_filter_time = tick + 1.5
                 self.core.filters.next_filter()
-                self.core.ui.set_text("filter_name", 'Current filter is {}'.format(self.core.filters.current_name))
+                self.core.ui.set_text("filter_name", self.core.filters.current_display_name)
 
     def update_filter_trigger(self, finger_count):
         if finger_count == 5:
@@ -230,28 +326,37 @@ class Filter(State):
     """
     def __init__(self):
         self.countdown_time = 0.0
+        self.filter_job = None
 
     def enter(self, tick):
         self.countdown_time = tick + 4
         self.core.ui.hide("idle_text_1", "idle_text_2", "bar")
         self.core.ui.hide("help_1", "help_2", "filter_name", "image_showing_promote")
-        self.core.ui.set_text("countdown", "3")
+        self.core.ui.set_text("countdown", COUNTDOWN_TEXTS[3])
         self.core.ui.show("countdown")
 
     def update(self, tick, frame):
         if self.countdown_time - tick > 0:
-            self.core.ui.set_text("countdown", '{}'.format(int(self.countdown_time - tick)))
+            self.core.ui.set_text("countdown", COUNTDOWN_TEXTS[int(self.countdown_time - tick)])
             self.core.out_frame = frame
-        else:
+        elif self.filter_job is None:
+            # Filter the snapshot in worker thread and keep showing live preview meanwhile
             self.core.ui.hide("countdown")
-            self.apply_filter(frame)
+            self.filter_job = self.core.executor.submit(self.apply_filter, frame)
+            self.core.out_frame = frame
+        elif not self.filter_job.done():
+            self.core.out_frame = frame
+        else:
+            self.core.filtered_frame = self.filter_job.result()
             self.core.set_state(ShowPic())
 
     def apply_filter(self, frame):
+        if not getattr(self.core.filters.current_filter, 'needs_mask', True):
+            return self.core.filters.current_filter(frame)
 
         masked_frame = self.core.fg_masker.apply(frame)
         filtered_frame = self.core.filters.current_filter(masked_frame)
-        self.core.filtered_frame = self.core.fg_masker.changeBackground(filtered_frame, self.core.filters.current_name)
+        return self.core.fg_masker.changeBackground(filtered_frame, self.core.filters.current_name)
 
 class ShowPic(State):
     """
@@ -265,7 +370,7 @@ class ShowPic(State):
 
     def enter(self, tick):
         self.core.ui.hide("countdown")
-        self.core.ui.set_text("filter_name", 'Current filter is {}'.format(self.core.filters.current_name))
+        self.core.ui.set_text("filter_name", self.core.filters.current_display_name)
         self.core.ui.show("filter_name")
         self.core.ui.show("image_showing_promote")
 
@@ -281,11 +386,13 @@ class ShowPic(State):
         # Detect fingers 10 times in a second
         # Using timer here because frame rate can differ
         if self.finger_frame_interval - tick < 0:
-            finger_count = self.core.hand_detector.count_fingers(frame)
+            finger_count = self.core.request_finger_count(frame)
             self.finger_frame_interval = tick + 0.1
-            self.update_filter_trigger(finger_count)
+            # Triggers advance once per detection, not once per tick
+            if finger_count is not None:
+                self.update_filter_trigger(finger_count)
 
-            self.core.ui.set_prog("bar", self.take_pic_cnt)
+                self.core.bar.scale = self.take_pic_cnt
 
     def update_filter_trigger(self, finger_count):
         if finger_count == 5:
@@ -4,24 +4,33 @@
 import itertools
 
 # Internal modules
-from smart_canvas.filters.painterly import painterly_filter
+from smart_canvas.filters.painterly import painterly_filter, warmup as painterly_warmup
 from smart_canvas.filters.watercolor import watercolor
 from smart_canvas.filters.oil_painting import oil_painting
 
 
 class FilterCarousel:
+    # Filters are applied to foreground on top of a background image. A filter
+    # function can set needs_mask = False to get the whole frame without segmentation
     catalog = {
         'painterly': painterly_filter,
         'watercolor': watercolor,
         'oil painting': oil_painting
     }
     carousel = itertools.cycle(catalog)
+    # UI labels are formatted once
+    display_names = {name: 'Current filter is {}'.format(name) for name in catalog}
 
     def __init__(self, **kwargs):
         self.next_filter()
 
 
+    def warmup(self):
+        # Compile JIT kernels of filters ahead of first use
+        painterly_warmup()
+
     def next_filter(self):
         self.current_name = next(self.carousel)
         self.current_filter = self.catalog[self.current_name]
+        self.current_display_name = self.display_names[self.current_name]
 
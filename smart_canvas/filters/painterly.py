@@ -1,6 +1,7 @@
 # External packages
 import cv2
 import numpy as np
+from numba import njit, prange
 
 def makeStroke(brush, x, y, img):
     '''
@@ -22,71 +23,97 @@ def makeStroke(brush, x, y, img):
 
     return stroke
 
-def makeSplineStroke(x, y, brush, img, canvas, gradients):
+# Strokes are traced this many steps at most and never stopped before min length
+MAX_STROKE_LENGTH = 16
+MIN_STROKE_LENGTH = 6
+
+@njit(parallel=True, cache=True)
+def traceSplineStrokes(xs, ys, brush, img, canvas, g_mag, grad_x, grad_y):
     '''
-    adds a brush stroke to a list and return it for the paintLayer function to paint
+    trace a brush stroke from every grid point in parallel and return stroke points,
+    number of points in each stroke and stroke colors for the paintLayer function to paint
     '''
-    g_mag, grad_x, grad_y = gradients
-    stroke_color = img[y,x]
-    stroke_points = [[x, y]]
-    lastDx, lastDy = (0,0)
-
-    maxStrokeLength = 16
-    minStrokeLength = 6
+    height, width = img.shape[0], img.shape[1]
+    stroke_count = xs.shape[0]
+    points = np.zeros((stroke_count, MAX_STROKE_LENGTH + 1, 2), dtype=np.int32)
+    lengths = np.ones(stroke_count, dtype=np.int32)
+    colors = np.zeros((stroke_count, 3), dtype=np.uint8)
     # f_c controls the usage of the previous gradient vs the current gradient
     f_c = 1.0
 
-    for i in range(maxStrokeLength):
-        if i > minStrokeLength:
-            if np.abs(np.sum(img[y,x], dtype=np.int16) - np.sum(canvas[y,x], dtype=np.int16)) < np.abs(np.sum(img[y,x], dtype=np.int16) - np.sum(stroke_color, dtype=np.int16)):
-                return [stroke_points, stroke_color.tolist(), brush]
-        if g_mag[y,x] == 0:
-            return [stroke_points, stroke_color.tolist(), brush]
-        gy, gx = grad_x[y,x], grad_y[y,x]
-        dx=gx
-        dy=-gy
-
-        if lastDx * dx + lastDy * dy < 0:
-            dx = -dx
-            dy = -dy
-        dx = f_c * dx + (1-f_c) * lastDx
-        dy = f_c * dy + (1 - f_c) * lastDy
-        if dx != 0 and dy != 0:
-            dx = dx / np.sqrt(dx ** 2 + dy ** 2)
-            dy = dy / np.sqrt(dx ** 2 + dy ** 2)
-        x, y = int(x + brush * dx), int(y + brush * dy)
-        if x > img.shape[1]-1:
-            x = img.shape[1]-1
-        if y > img.shape[0]-1:
-            y = img.shape[0]-1
-        lastDx, lastDy = dx, dy
-
-        stroke_points.append([x,y])
-    K = [stroke_points, stroke_color.tolist(), brush]
-    return K
+    for s in prange(stroke_count):
+        x, y = xs[s], ys[s]
+        colors[s, :] = img[y, x, :]
+        color_sum = int(img[y, x, 0]) + int(img[y, x, 1]) + int(img[y, x, 2])
+        points[s, 0, 0] = x
+        points[s, 0, 1] = y
+        lastDx, lastDy = 0.0, 0.0
+
+        for i in range(MAX_STROKE_LENGTH):
+            # negative coordinates wrap around like numpy indexing does
+            yi, xi = y % height, x % width
+            img_sum = int(img[yi, xi, 0]) + int(img[yi, xi, 1]) + int(img[yi, xi, 2])
+            if i > MIN_STROKE_LENGTH:
+                canvas_sum = int(canvas[yi, xi, 0]) + int(canvas[yi, xi, 1]) + int(canvas[yi, xi, 2])
+                if abs(img_sum - canvas_sum) < abs(img_sum - color_sum):
+                    break
+            if g_mag[yi, xi] == 0:
+                break
+            dx = grad_y[yi, xi]
+            dy = -grad_x[yi, xi]
+
+            if lastDx * dx + lastDy * dy < 0:
+                dx = -dx
+                dy = -dy
+            dx = f_c * dx + (1 - f_c) * lastDx
+            dy = f_c * dy + (1 - f_c) * lastDy
+            if dx != 0 and dy != 0:
+                dx = dx / np.sqrt(dx ** 2 + dy ** 2)
+                dy = dy / np.sqrt(dx ** 2 + dy ** 2)
+            x, y = int(x + brush * dx), int(y + brush * dy)
+            if x > width - 1:
+                x = width - 1
+            if y > height - 1:
+                y = height - 1
+            lastDx, lastDy = dx, dy
+
+            points[s, i + 1, 0] = x
+            points[s, i + 1, 1] = y
+            lengths[s] = i + 2
+
+    return points, lengths, colors
 
 def paintLayer(canvas, ref_img, brush, gradients):
     '''
     paint a brush layer
     '''
-    strokes = []
+    g_mag, grad_x, grad_y = gradients
 
     # f_g is the parameter to control grid size as a multiple of brush size
     f_g = 1.5
     grid = int(f_g * brush)
 
-    for x in range(0, ref_img.shape[1], grid):
-        for y in range(0, ref_img.shape[0], grid):
-            s = makeSplineStroke(x,y, brush, ref_img, canvas, gradients)
-            strokes.append(s)
-    np.random.shuffle(strokes)
+    xs, ys = np.meshgrid(
+        np.arange(0, ref_img.shape[1], grid, dtype=np.int64),
+        np.arange(0, ref_img.shape[0], grid, dtype=np.int64),
+        indexing='ij'
+    )
+    points, lengths, colors = traceSplineStrokes(xs.ravel(), ys.ravel(), brush, ref_img, canvas, g_mag, grad_x, grad_y)
 
-    if strokes is not None:
-        for s in strokes:
-            cv2.polylines(canvas, [np.array(s[0])], isClosed=False, color=s[1], thickness=s[2], lineType=cv2.LINE_AA)
+    for s in np.random.permutation(len(lengths)):
+        cv2.polylines(canvas, [points[s, :lengths[s]]], isClosed=False, color=colors[s].tolist(), thickness=brush, lineType=cv2.LINE_AA)
 
     return canvas
 
+def warmup():
+    '''
+    compile numba kernels with tiny arrays so that the first picture does not wait for JIT
+    '''
+    img = np.zeros((8, 8, 3), dtype=np.uint8)
+    grad = np.zeros((8, 8), dtype=np.float32)
+    coords = np.zeros(1, dtype=np.int64)
+    traceSplineStrokes(coords, coords, 4, img, img.copy(), grad, grad, grad)
+
 def calcImageGradients(img):
     '''
     Calculate the x and y gradient and gradient magnitude for the image.
@@ -98,7 +125,7 @@ def calcImageGradients(img):
     grad_x = cv2.Sobel(img, ddepth=cv2.CV_32F, dx=1, dy=0, ksize=5)
     grad_y = cv2.Sobel(img, ddepth=cv2.CV_32F, dx=0, dy=1, ksize=5)
 
-    # code breaks if we don't include these, "index -1072 is out of bounds for axis 1 with size 490" at "if g_mag[y,x] == 0:" in makeSplineStroke()
+    # code breaks if we don't include these, "index -1072 is out of bounds for axis 1 with size 490" at "if g_mag[yi, xi] == 0:" in traceSplineStrokes()
     
     if np.max(grad_y) == 0.0 or np.max(grad_x) == 0.0:
         grad_x = np.array([0])
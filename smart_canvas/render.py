@@ -1,8 +1,7 @@
 from moderngl import TRIANGLE_STRIP
-from queue import Queue
 
 
-from smart_canvas.capture import VideoRead
+from smart_canvas.capture import VideoRead, LatestFrameQueue
 from smart_canvas.core import CanvasCore
 from smart_canvas.window import Window
 
@@ -17,19 +16,42 @@ class SmartRender(Window):
         vp = self.ctx.fbo.viewport
         self.win_size = (vp[2] - vp[0], vp[3] - vp[1])
 
-        self.videoQueue = Queue(maxsize=5)
+        self.videoQueue = LatestFrameQueue()
         self.video = VideoRead(q_producer=self.videoQueue, src=self.camera).start()
         self.core = CanvasCore(q_consumer=self.videoQueue, screensize=self.win_size).start()
 
         # set texture to size from camera
         self.frame_texture = self.ctx.texture(
             (self.video.width, self.video.height), 3)  # , internal_format=0x8C41)
+        # Id of frame currently in texture
+        self.frame_id = None
+        # Two pixel buffers. New frame is written to one while texture is updated
+        # from the other that was filled on previous render (one frame latency)
+        frame_bytes = self.video.width * self.video.height * 3
+        self.pbos = [self.ctx.buffer(reserve=frame_bytes, dynamic=True) for _ in range(2)]
+        self.pbo_index = 0
+        self.pbo_ready = None
 
     def render(self, _time, frame_time):
-        if self.core.out_frame is None:
+        frame_id, out_frame = self.core.get_display_frame()
+        if out_frame is None:
             return
 
-        self.frame_texture.write(self.core.out_frame)
+        # Upload only when core has produced a new frame
+        if frame_id != self.frame_id:
+            if self.pbo_ready is not None:
+                self.frame_texture.write(self.pbo_ready)
+            pbo = self.pbos[self.pbo_index]
+            # Orphan so driver gives fresh storage instead of waiting for earlier reads of this buffer
+            pbo.orphan()
+            pbo.write(out_frame)
+            self.pbo_ready = pbo
+            self.pbo_index = 1 - self.pbo_index
+            self.frame_id = frame_id
+        elif self.pbo_ready is not None:
+            # No newer frame so show the pending one
+            self.frame_texture.write(self.pbo_ready)
+            self.pbo_ready = None
         self.frame_texture.use(0)
         self.quad.render(mode=TRIANGLE_STRIP)
 
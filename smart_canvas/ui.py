@@ -1,6 +1,7 @@
 from pyrr import matrix44
 import numpy as np
 
+from functools import lru_cache
 from pathlib import Path
 
 from moderngl_window.text.bitmapped import TextWriter2D
@@ -10,17 +11,36 @@ from moderngl_window.meta import (
     TextureDescription,
     DataDescription,
 )
-from moderngl import TRIANGLE_STRIP
+from moderngl import TRIANGLE_STRIP, POINTS
+from moderngl_window.opengl.vao import VAO
 from moderngl_window.text.bitmapped.base import FontMeta
 
 
 resources.register_dir(Path(__file__).parent.resolve())
 
-class TextWriterTest(TextWriter2D):
+def changed_range(new, old):
     """
-    Class for creating text in OpenGL context. Extended from TextWriter2D
+    Return start and end index of glyphs in new that differ from old.
+    Rows are glyphs, so 2D arrays are compared row by row. Start equals end when nothing changed.
     """
-    def __init__(self, position, size=24.0):
+    common = min(len(new), len(old))
+    diff = new[:common] != old[:common]
+    if diff.ndim > 1:
+        diff = diff.any(axis=1)
+    changed = np.flatnonzero(diff)
+    start = int(changed[0]) if len(changed) else common
+    end = int(changed[-1]) + 1 if len(changed) else common
+    # Glyphs past the old length are always new
+    if len(new) > common:
+        end = len(new)
+    return start, end
+
+class TextBatch(TextWriter2D):
+    """
+    Class for rendering glyphs of all text elements with one instanced draw call.
+    Extended from TextWriter2D
+    """
+    def __init__(self, max_glyphs=1024):
         super().__init__()
 
         meta = FontMeta(resources.data.load(DataDescription(path="backgrounds/meta.json")))
@@ -37,9 +57,103 @@ class TextWriterTest(TextWriter2D):
         self._program = resources.programs.load(
             ProgramDescription(path="shaders/text.glsl")
         )
+        self._max_glyphs = max_glyphs
+        # Lookup table from latin-1 byte to ISO -- letter position in texture map
+        self._charmap_lut = np.fromiter(
+            self._translate_string("".join(chr(i) for i in range(256))),
+            dtype=np.uint32,
+        )
+        # Same strings recur (countdown, filter names) so keep their glyph ids
+        self.translate = lru_cache(maxsize=64)(self._translate)
+        # String buffer is in_char_id at glsl. Glyph buffer holds position and size for every letter
+        self._string_buffer = self.ctx.buffer(reserve=max_glyphs * 4)
+        self._glyph_buffer = self.ctx.buffer(reserve=max_glyphs * 4 * 4)
+
+        self._vao = VAO("textbatch", mode=POINTS)
+        self._vao.buffer(self.ctx.buffer(data=bytes([0] * 4 * 3)), "3f", "in_position")
+        self._vao.buffer(self._string_buffer, "1u/i", "in_char_id")
+        self._vao.buffer(self._glyph_buffer, "2f 2f/i", ["in_char_pos", "in_char_size"])
+
+        # Texts queued for this frame and layout currently in buffers
+        self._queue = []
+        self._layout = None
+        self._count = 0
+        # Copies of data currently in buffers. Used to upload only changed glyphs
+        self._ids = np.zeros(0, dtype=np.uint32)
+        self._glyphs = np.zeros((0, 4), dtype=np.float32)
+        # Last projection written to the program
+        self._projection = None
+
+    def _translate(self, text: str):
+        # ISO -- letter positions. These are used to find correct textures for letters in map
+        ids = self._charmap_lut[np.frombuffer(text.encode("latin-1", "replace"), dtype=np.uint8)]
+        # Cached arrays are shared between elements
+        ids.flags.writeable = False
+        return ids
+
+    def add(self, text_element):
+        self._queue.append(text_element)
+
+    def _write(self, texts):
+        # Gather glyphs of all texts so that every letter is one instance
+        ids = np.concatenate([t.ids for t in texts])
+        glyphs = np.empty((len(ids), 4), dtype=np.float32)
+        start = 0
+        for t in texts:
+            end = start + len(t.ids)
+            char_w = self._meta.char_aspect_wh * t.size
+            glyphs[start:end, 0] = t.pos[0] + np.arange(end - start) * char_w
+            glyphs[start:end, 1] = t.pos[1]
+            glyphs[start:end, 2] = char_w
+            glyphs[start:end, 3] = t.size
+            start = end
+
+        self._count = min(len(ids), self._max_glyphs)
+        ids, glyphs = ids[:self._count], glyphs[:self._count]
+        # Buffers are allocated once at max size so no orphaning is needed
+        self._upload(self._string_buffer, ids, self._ids)
+        self._upload(self._glyph_buffer, glyphs, self._glyphs)
+        self._ids, self._glyphs = ids, glyphs
+
+    @staticmethod
+    def _upload(buffer, new, old):
+        # Write only the range of glyphs that differs from previous upload
+        start, end = changed_range(new, old)
+        if start < end:
+            buffer.write(new[start:end].tobytes(), offset=start * new.strides[0])
+
+    def draw(self, projection):
+        texts, self._queue = self._queue, []
+        if not texts:
+            return
+        # Rewrite buffers only when visible texts have changed
+        layout = [(t.text, t.pos, t.size) for t in texts]
+        if layout != self._layout:
+            self._write(texts)
+            self._layout = layout
+        if self._count == 0:
+            return
+
+        self._texture.use(location=0)
+        # Projection is cached by UI so upload it only when viewport has changed
+        if projection is not self._projection:
+            self._program["m_proj"].write(projection)
+            self._projection = projection
+        self._program["font_texture"].value = 0
+
+        self._vao.render(self._program, instances=self._count)
+
+class TextWriterTest:
+    """
+    Class for holding text element data. Glyphs are rendered by TextBatch
+    """
+    def __init__(self, batch: TextBatch, position, size=24.0):
+        self._batch = batch
         self.pos = position
         self.size = size
         self.visible = False
+        self._text = ""
+        self.ids = np.zeros(0, dtype=np.uint32)
 
     @property
     def text(self) -> str:
@@ -47,48 +161,14 @@ class TextWriterTest(TextWriter2D):
 
     @text.setter
     def text(self, value: str):
+        if value == self._text:
+            return
         self._text = value
-        # String buffer is in_char_id at glsl
-        self._string_buffer.orphan(size=len(value) * 4)
-
-        self._string_buffer.clear(chunk=b'\32')
-        self._write(value)
-
-    def _write(self, text: str):
-        # put ISO -- letter positions in opengl buffer. These are used to find correct textures for letters in map
-        self._string_buffer.clear(chunk=b'\32')
-
-        self._string_buffer.write(
-            np.fromiter(
-                self._translate_string(text),
-                dtype=np.uint32,
-            )
-        )
-
-    def draw(self, length=-1):
-        # Calculate ortho projection based on viewport
-        vp = self.ctx.fbo.viewport
-        w, h = vp[2] - vp[0], vp[3] - vp[1]
-        # projection matrix to viewport so we can use pixel coordinates
-        # right low corner is 0,0 as expected
-        projection = matrix44.create_orthogonal_projection_matrix(
-            0,  # left
-            w,  # right
-            h,  # bottom
-            0,  # top
-            1,  # near
-            -1.0,  # far
-            dtype=np.float32,
-        )
-
-        self._texture.use(location=0)
-        self._program["m_proj"].write(projection)
-        self._program["text_pos"].value = self.pos
-
-        self._program["font_texture"].value = 0
-        self._program["char_size"].value = self._meta.char_aspect_wh * self.size, self.size
+        self.ids = self._batch.translate(value)
 
-        self._vao.render(self._program, instances=len(self._text))
+    def draw(self, projection):
+        # Queue text to batch. Batch renders all queued texts at once
+        self._batch.add(self)
 
 class Image2D():
     """
@@ -140,21 +220,7 @@ class Image2D():
         self._image = resources.textures.load(TextureDescription(
             path, midmap=False,))
 
-    def draw(self):
-        # Calculate ortho projection based on viewport
-        vp = self.ctx.fbo.viewport
-        w, h = vp[2] - vp[0], vp[3] - vp[1]
-        # projection matrix to viewport so we can use pixel coordinates
-        # right low corner is 0,0 as expected
-        projection = matrix44.create_orthogonal_projection_matrix(
-            0,  # left
-            w,  # right
-            0,  # bottom
-            h,  # top
-            1,  # near
-            -1.0,  # far
-            dtype=np.float32,
-        )
+    def draw(self, projection=None):
         #self.pos = (1.0, 1.0)
         self._image.use(location=0)
         self.vao.render(TRIANGLE_STRIP)
@@ -179,6 +245,8 @@ class Progressbar():
         self.vbo = self.ctx.buffer(vertices.astype('f4').tobytes())
         self.visible = True
         self._scale = 0.0
+        # Scale last written to uniform
+        self._scale_last = None
 
         self.vao = self.ctx.vertex_array(
             self._program,
@@ -189,7 +257,7 @@ class Progressbar():
 
     @property
     def scale(self):
-        return self.scale
+        return self._scale
 
     @scale.setter
     def scale(self,value):
@@ -198,8 +266,10 @@ class Progressbar():
         else:
             self._scale = value
 
-    def draw(self):
-        self._program["scale"] = self._scale 
+    def draw(self, projection=None):
+        if self._scale != self._scale_last:
+            self._program["scale"].value = self._scale
+            self._scale_last = self._scale
         self.vao.render(mode=TRIANGLE_STRIP)
 
 class DummyElement:
@@ -209,7 +279,7 @@ class DummyElement:
         self.size = 0
         self.text = ""
 
-    def draw(self):
+    def draw(self, projection=None):
         pass
 
 class UI:
@@ -231,13 +301,24 @@ class UI:
         self.elements = dict()
         self.texts = dict()
         self.images = dict()
+        # All text elements share one batch
+        self._text_batch = None
+        # Visible elements in draw order. Rebuilt when visibility changes
+        self._visible_cache = []
+
+        # Ortho projection is recalculated only when viewport changes
+        self._projection = None
+        self._vp_cache = None
 
     # add new element
     def create_text(self, name: str, pos: tuple, size: float):
         if ContextRefs.CONTEXT:
-            self.elements[name] = TextWriterTest(pos,size)
+            if self._text_batch is None:
+                self._text_batch = TextBatch()
+            self.elements[name] = TextWriterTest(self._text_batch, pos, size)
         else:
             self.elements[name] = DummyElement()
+        self._update_visible()
 
     def create_image(self, path: str, pos: tuple, size: tuple):
         self.images[path] = Image2D(pos, size, path)
@@ -247,39 +328,68 @@ class UI:
             self.elements[name] = Progressbar()
         else:
             self.elements[name] = DummyElement()
+        self._update_visible()
 
     def set_text(self, name: str, text: str):
         if name not in self.elements:
             raise KeyError("Element not found. Check name or element not created!")
         self.texts[name] = text
 
-    def set_prog(self, name: str, value: float):
-        if name not in self.elements:
+    def get(self, name: str):
+        # Single lookup. Callers on hot paths can keep the returned element
+        element = self.elements.get(name)
+        if element is None:
             raise KeyError("Element not found. Check name or element not created!")
-        self.elements[name].scale = value
+        return element
+
+    def set_prog(self, name: str, value: float):
+        self.get(name).scale = value
 
     def get_prog(self, name: str):
-        if name not in self.elements:
-            raise KeyError("Element not found. Check name or element not created!")
-        return self.elements[name].scale
-        
+        return self.get(name).scale
+
     def show(self, *names: str):
         for name in names:
-            if name not in self.elements:
-                raise KeyError("Element not found. Check name or element not created!")
-            self.elements[name].visible = True
+            self.get(name).visible = True
+        self._update_visible()
 
     def hide(self, *names: str):
         for name in names:
-            if name not in self.elements:
-                raise KeyError("Element not found. Check name or element not created!")
-            self.elements[name].visible = False
-
+            self.get(name).visible = False
+        self._update_visible()
+
+    def _update_visible(self):
+        # Assign new list so drawing thread never sees a half built one
+        self._visible_cache = [v for v in self.elements.values() if v.visible]
+
+    def get_projection(self):
+        if not ContextRefs.CONTEXT:
+            return None
+        vp = ContextRefs.CONTEXT.fbo.viewport
+        if vp != self._vp_cache:
+            w, h = vp[2] - vp[0], vp[3] - vp[1]
+            # projection matrix to viewport so we can use pixel coordinates
+            # right low corner is 0,0 as expected
+            self._projection = matrix44.create_orthogonal_projection_matrix(
+                0,  # left
+                w,  # right
+                h,  # bottom
+                0,  # top
+                1,  # near
+                -1.0,  # far
+                dtype=np.float32,
+            )
+            self._vp_cache = vp
+        return self._projection
 
     def draw(self):
         #copy new texts to buffer
         for k,v in self.texts.items():
-            if self.elements[k].text is not v:
-                self.elements[k].text = v 
+            if self.elements[k].text != v:
+                self.elements[k].text = v
+        projection = self.get_projection()
         #render all
-        {v.draw() for k,v in self.elements.items() if v.visible }
+        for element in self._visible_cache:
+            element.draw(projection)
+        if self._text_batch:
+            self._text_batch.draw(projection)
@@ -0,0 +1,12 @@
+""" capture_test.py """
+
+from smart_canvas.capture import LatestFrameQueue
+
+
+class TestLatestFrameQueue:
+    def test_keeps_latest(self):
+        queue = LatestFrameQueue()
+        for frame in range(3):
+            queue.put(frame)
+        assert queue.qsize() == 1
+        assert queue.get() == 2
@@ -25,6 +25,34 @@ def core(queue):
     queue.put(None)
 
 
+@pytest.fixture()
+def stopped_core(queue):
+    # Threads are not started so finger detection results are set by test
+    core = CanvasCore(queue, screensize=(1280,720))
+    yield core
+    core.stop()
+
+
+class TestFingerCount:
+    def test_detection_used_once(self, stopped_core):
+        # Frame 1 published, nothing detected yet
+        assert stopped_core.request_finger_count(five_fingers) is None
+        stopped_core.finger_result = (1, 5)
+        assert stopped_core.request_finger_count(five_fingers) == 5
+        # Same detection is not counted again on next tick
+        assert stopped_core.request_finger_count(five_fingers) is None
+
+    def test_detection_not_carried_to_next_state(self, stopped_core):
+        stopped_core.request_finger_count(five_fingers)
+        stopped_core.request_finger_count(five_fingers)
+        stopped_core.finger_result = (2, 5)
+        stopped_core.set_state(ShowPic())
+        # Detection of frame from previous state must not be used
+        assert stopped_core.request_finger_count(five_fingers) is None
+        stopped_core.finger_result = (3, 2)
+        assert stopped_core.request_finger_count(five_fingers) == 2
+
+
 class TestCoreState:
     def test_smart_canvas(self, core, queue):
 
@@ -42,4 +70,30 @@ class TestCoreState:
             time.sleep(0.1)
         assert type(core._state) is type(ShowPic())
 
+    def test_display_frame_id(self, core):
+        frame_id, _ = core.get_display_frame()
+        core.out_frame = two_fingers
+        new_id, out_frame = core.get_display_frame()
+        assert new_id != frame_id
+        assert out_frame is two_fingers
+        # Same frame object again does not change id
+        core.out_frame = two_fingers
+        assert core.get_display_frame()[0] == new_id
+        core.out_frame = five_fingers
+        assert core.get_display_frame()[0] != new_id
+
+    def test_filter_without_mask_skips_segmentation(self, core):
+        class NoMasker:
+            def apply(self, frame):
+                raise AssertionError("Segmentation should be skipped")
+
+        def identity(frame):
+            return frame
+        identity.needs_mask = False
+
+        core.fg_masker = NoMasker()
+        core.filters.current_filter = identity
+        state = Filter()
+        state.core = core
+        assert state.apply_filter(two_fingers) is two_fingers
 
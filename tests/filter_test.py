@@ -5,6 +5,41 @@ import pytest
 import numpy as np
 
 from smart_canvas.filters.carousel import FilterCarousel
+from smart_canvas.filters.painterly import calcImageGradients, traceSplineStrokes
+
+
+def spline_stroke(x, y, brush, img, canvas, gradients):
+    # Per point stroke tracing as it was before numba kernel
+    g_mag, grad_x, grad_y = gradients
+    stroke_color = img[y,x]
+    stroke_points = [[x, y]]
+    lastDx, lastDy = (0,0)
+    f_c = 1.0
+    for i in range(16):
+        if i > 6:
+            if np.abs(np.sum(img[y,x], dtype=np.int16) - np.sum(canvas[y,x], dtype=np.int16)) < np.abs(np.sum(img[y,x], dtype=np.int16) - np.sum(stroke_color, dtype=np.int16)):
+                return stroke_points, stroke_color.tolist()
+        if g_mag[y,x] == 0:
+            return stroke_points, stroke_color.tolist()
+        gy, gx = grad_x[y,x], grad_y[y,x]
+        dx=gx
+        dy=-gy
+        if lastDx * dx + lastDy * dy < 0:
+            dx = -dx
+            dy = -dy
+        dx = f_c * dx + (1-f_c) * lastDx
+        dy = f_c * dy + (1 - f_c) * lastDy
+        if dx != 0 and dy != 0:
+            dx = dx / np.sqrt(dx ** 2 + dy ** 2)
+            dy = dy / np.sqrt(dx ** 2 + dy ** 2)
+        x, y = int(x + brush * dx), int(y + brush * dy)
+        if x > img.shape[1]-1:
+            x = img.shape[1]-1
+        if y > img.shape[0]-1:
+            y = img.shape[0]-1
+        lastDx, lastDy = dx, dy
+        stroke_points.append([x,y])
+    return stroke_points, stroke_color.tolist()
 
 
 @pytest.fixture()
@@ -46,3 +81,22 @@ class TestFilters(object):
             assert h == p_h
             assert c == p_c
             carousel.next_filter()
+
+    def test_stroke_kernel_matches_reference(self):
+        rng = np.random.default_rng(0)
+        img = cv2.GaussianBlur(rng.integers(0, 256, (40, 60, 3), dtype=np.uint8), (0,0), sigmaX=3)
+        canvas = rng.integers(0, 256, (40, 60, 3), dtype=np.uint8)
+        gradients = calcImageGradients(img)
+        brush = 4
+        xs, ys = np.meshgrid(
+            np.arange(0, img.shape[1], 6, dtype=np.int64),
+            np.arange(0, img.shape[0], 6, dtype=np.int64),
+            indexing='ij'
+        )
+        xs, ys = xs.ravel(), ys.ravel()
+        points, lengths, colors = traceSplineStrokes(xs, ys, brush, img, canvas, *gradients)
+        for s in range(len(xs)):
+            ref_points, ref_color = spline_stroke(int(xs[s]), int(ys[s]), brush, img, canvas, gradients)
+            assert lengths[s] == len(ref_points)
+            assert points[s, :lengths[s]].tolist() == ref_points
+            assert colors[s].tolist() == ref_color
@@ -1,11 +1,20 @@
 """ ui_test.py """
 
+import numpy as np
 import pytest
 
-from smart_canvas.ui import UI
+from smart_canvas.ui import UI, TextBatch, changed_range
 import moderngl
 
 
+class FakeBuffer:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data, offset=0):
+        self.writes.append((data, offset))
+
+
 @pytest.fixture()
 def ui():
     yield UI()
@@ -43,4 +52,43 @@ class TestUI(object):
         with pytest.raises(KeyError):
             ui.set_text("test","test")
             ui.show("test")
-            ui.hide("test")
\ No newline at end of file
+            ui.hide("test")
+
+class TestGlyphUpload(object):
+
+    def test_changed_range(self):
+        old = np.array([1, 2, 3, 4], dtype=np.uint32)
+        # No changes
+        assert changed_range(old.copy(), old) == (4, 4)
+        # Middle glyph changed
+        assert changed_range(np.array([1, 9, 3, 4], dtype=np.uint32), old) == (1, 2)
+        # Longer text writes tail too
+        assert changed_range(np.array([1, 2, 3, 4, 5, 6], dtype=np.uint32), old) == (4, 6)
+        assert changed_range(np.array([9, 2, 3, 4, 5], dtype=np.uint32), old) == (0, 5)
+        # Shorter text writes only changed glyphs
+        assert changed_range(np.array([1, 2], dtype=np.uint32), old) == (2, 2)
+        assert changed_range(np.array([1, 7], dtype=np.uint32), old) == (1, 2)
+        # From empty buffer
+        assert changed_range(old, np.zeros(0, dtype=np.uint32)) == (0, 4)
+
+    def test_changed_range_rows(self):
+        old = np.zeros((3, 4), dtype=np.float32)
+        new = old.copy()
+        new[1, 3] = 1.0
+        assert changed_range(new, old) == (1, 2)
+
+    def test_upload_offset(self):
+        buffer = FakeBuffer()
+        old = np.zeros((3, 4), dtype=np.float32)
+        new = np.zeros((4, 4), dtype=np.float32)
+        new[2, 0] = 1.0
+        TextBatch._upload(buffer, new, old)
+        assert buffer.writes == [(new[2:4].tobytes(), 2 * 4 * 4)]
+
+        buffer = FakeBuffer()
+        TextBatch._upload(buffer, np.array([1, 5, 3], dtype=np.uint32), np.array([1, 2, 3], dtype=np.uint32))
+        assert buffer.writes == [(np.array([5], dtype=np.uint32).tobytes(), 4)]
+
+        buffer = FakeBuffer()
+        TextBatch._upload(buffer, new, new.copy())
+        assert buffer.writes == []
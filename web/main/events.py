@@ -65,11 +65,10 @@ def handle_client_message(message):
     b64_frame = message.split(",")[1]
     cv_image = b64_to_cv(b64_frame)
     producer_q.put(cv_image)
-    if 'out_frame' not in vars(core):
+    _, out_frame = core.get_display_frame()
+    if out_frame is None:
         return
-    if core.out_frame is None:
-        return
-    mod_message = header + "," + cv_to_b64(core.out_frame)
+    mod_message = header + "," + cv_to_b64(out_frame)
     socketio.emit('consume', mod_message, to=sid, broadcast=False)
 
 @socketio.on('update_ui_request')